@@ -2,13 +2,21 @@ import json
 import logging
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from difflib import SequenceMatcher
 from logging import handlers as log_handlers
 from pathlib import Path
 from random import choices
 
 from config_handler import ConfigHandler
-from constants import LOG_PATH
+from constants import (HEAVY_WALLPAPER_PLAYBACK, HEAVY_WALLPAPER_SIZE,
+                       INDEX_WORKERS, LOG_PATH, PLAYBACK_BY_TYPE,
+                       PLAYBACK_SETTINGS, POWER_PROFILES, POWER_SUPPLY_PATH,
+                       PREFETCH_CHUNK_SIZE, PREFETCH_MAX_BYTES,
+                       PROFILE_SETTINGS)
+from media_info import (fits_resolution, folder_fingerprint, folder_size,
+                        media_resolution)
 
 
 class SettingsChanger():
@@ -84,6 +92,24 @@ class SettingsChanger():
         else:
             self.handler.add_pos(name, val)
 
+    def setup_many(self, settings):
+        self.logger.debug(
+            f'called method [setup_many] with arguments (settings={settings})')
+        plasma_settings = {}
+        for name, val in settings.items():
+            if name not in self.name_to_pattern.keys():
+                self.handler.add_pos(name, val)
+                continue
+            if not self.name_type_check[name](val):
+                error_msg = f'Invalid value ({val}) for setting "{name}"'
+                self.logger.error(
+                    f'Hangled exception: "{error_msg}", program finished')
+                raise ValueError(error_msg)
+            plasma_settings[name] = val
+        if plasma_settings:
+            # One plasma script for all settings instead of a D-Bus call per setting
+            self.handler.send_cmds(plasma_settings)
+
     def read(self, setting=None):
         self.logger.debug(
             f'called method [read] with arguments (setting={setting})')
@@ -129,7 +155,7 @@ class SettingsChanger():
 
 
 class WallpaperChanger():
-    def __init__(self, steampath, logging_handler=None) -> None:
+    def __init__(self, steampath, logging_handler=None, *, settings_changer=None, power_changer=None) -> None:
         if logging_handler is None:
             formatter = logging.Formatter(
                 '%(asctime)s - [%(levelname)s] - [%(module)s] - "%(message)s"')
@@ -143,27 +169,71 @@ class WallpaperChanger():
 
         self.handler = ConfigHandler(
             logging_handler=logging_handler)
-        self.settings_changer = SettingsChanger(
-            steampath, logging_handler=None)
+        if settings_changer is None:
+            settings_changer = SettingsChanger(
+                steampath, logging_handler=logging_handler)
+        self.settings_changer = settings_changer
+        if power_changer is None:
+            power_changer = PowerChanger(
+                steampath, logging_handler=logging_handler, settings_changer=settings_changer)
+        self.power_changer = power_changer
         self._steampath = Path(steampath)
+        # Seconds spent on the plasma update by the last "setup" call
+        self.last_update_time = None
 
         wpe_id = self.handler.get_data('WallpaperEngineSteamID')
         self.project_name = self.handler.get_data('WallpaperProjectName')
         self.full_path = self._steampath / \
             Path('steamapps/workshop/content') / wpe_id
 
-    def get_data(self, wp_path: Path, files: list):
-        self.logger.debug(
-            f'called method [get_data] with arguments (wp_path={wp_path}, files={files})')
-        if self.project_name in files:
-            with open(Path(wp_path) / self.project_name, 'r') as file:
-                data = json.load(file)
-                self.handler.add_pos(Path(wp_path).name, data)
+    def _index_folder(self, wp_path: Path, cached: dict):
+        with open(wp_path / self.project_name, 'r') as file:
+            data = json.load(file)
+        fingerprint = folder_fingerprint(
+            wp_path, self.project_name, data.get('file'))
+        if cached.get('fingerprint') == fingerprint and 'disksize' in cached:
+            self.logger.debug(f'folder "{wp_path}" is unchanged, use cache')
+            for key in ('disksize', 'resolution'):
+                if key in cached:
+                    data[key] = cached[key]
+        else:
+            data['disksize'] = folder_size(wp_path)
+            if data.get('file'):
+                resolution = media_resolution(wp_path / data['file'])
+                if resolution is not None:
+                    data['resolution'] = list(resolution)
+        # Keep what the user has set for this wallpaper
+        for key in ('freq', 'playback'):
+            if key in cached:
+                data[key] = cached[key]
+        data['fingerprint'] = fingerprint
+        return wp_path.name, data
 
     def get_all_data(self):
         self.logger.debug(f'called method [get_all_data]')
-        for root, _, files in os.walk(self.full_path):
-            self.get_data(Path(root), files)
+        cached_data = self.handler.get_data()
+        folders = [Path(root) for root, _, files in os.walk(self.full_path)
+                   if self.project_name in files]
+        with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as executor:
+            results = executor.map(
+                lambda path: self._index_folder(
+                    path, cached_data.get(path.name, {})),
+                folders)
+            self.handler.add_many(dict(results))
+
+    def get_library_stats(self, top=10):
+        self.logger.debug(
+            f'called method [get_library_stats] with arguments (top={top})')
+        wp_ids = self.handler.get_ids()
+        totals = {}
+        for data in wp_ids.values():
+            wp_type = data.get('type', 'Unspecified').lower()
+            count, size = totals.get(wp_type, (0, 0))
+            totals[wp_type] = (count + 1, size + data.get('disksize', 0))
+        largest = sorted(wp_ids.items(),
+                         key=lambda item: item[1].get('disksize', 0),
+                         reverse=True)[:top]
+        return totals, largest
 
     def get_last_id_name(self):
         self.logger.debug('called method [get_last_id_name]')
@@ -179,9 +249,9 @@ class WallpaperChanger():
         self.logger.debug(f'returning value ({(id, name)})')
         return id, name
 
-    def setup(self, name, *, silent_delete=False, fuzzy=True):
+    def find_id(self, name, *, fuzzy=True):
         self.logger.debug(
-            f'called method [setup] with arguments (name={name}, silent_delete={silent_delete}, fuzzy={fuzzy})')
+            f'called method [find_id] with arguments (name={name}, fuzzy={fuzzy})')
         if type(name) in (tuple, list, set):
             name = name[0]
         name_id = None
@@ -204,10 +274,16 @@ class WallpaperChanger():
             else:
                 compare_results.sort(key=lambda x: x[1], reverse=True)
                 name_id = compare_results[0][0]
+        self.logger.debug(f'returning value ({name_id})')
+        return name_id
 
-        wp_type = wp_data[name_id]['type'].lower()
-        self.handler.send_cmd('WallpaperWorkShopId', name_id)
+    def setup(self, name, *, silent_delete=False, fuzzy=True):
+        self.logger.debug(
+            f'called method [setup] with arguments (name={name}, silent_delete={silent_delete}, fuzzy={fuzzy})')
+        name_id = self.find_id(name, fuzzy=fuzzy)
+        wp_data = self.handler.get_ids()
 
+        wp_type = wp_data[name_id]['type'].lower()
         tail = wp_data[name_id]['file'] + '+' + wp_type
         wp_path = self.full_path / Path(name_id) / Path(tail)
         if not Path(self.full_path / Path(name_id)).exists():
@@ -218,10 +294,187 @@ class WallpaperChanger():
                 print(f'error path: "{wp_path}"')
                 raise KeyError(
                     f'This id not exists: "{name_id}" with name "{name}"')
+
+        self.power_changer.save_globals(wp_data[name_id].get('playback', {}))
+        playback, overridden = self.get_playback_settings(wp_data[name_id])
+        settings = {'WallpaperWorkShopId': name_id}
         # wp_path.as_uri() breaks encoding
-        self.handler.send_cmd('WallpaperSource', 'file://'+str(wp_path))
+        settings['WallpaperSource'] = 'file://'+str(wp_path)
+        settings.update(playback)
+        # Wallpaper and its playback settings are changed by the same plasma script
+        start_time = time.perf_counter()
+        self.settings_changer.setup_many(settings)
+        self.last_update_time = time.perf_counter() - start_time
+        self.handler.add_pos('playback_applied', overridden)
         self.handler.update_last_ids(name_id)
 
+    def get_playback_settings(self, data):
+        """Playback settings to send together with the wallpaper.
+
+        Returns the settings and the names overridden by this wallpaper.
+        Settings overridden by the previous wallpaper are reverted to
+        the power profile or to the values saved by "pull".
+        """
+        self.logger.debug('called method [get_playback_settings]')
+        power_settings = self.power_changer.get_active_settings()
+        overrides = self.power_changer.merge_playback(
+            data.get('playback', {}), power_settings)
+        try:
+            last_overridden = self.handler.get_data('playback_applied')
+        except KeyError:
+            last_overridden = []
+        settings = {}
+        for name in last_overridden:
+            if name in overrides:
+                continue
+            if name in power_settings:
+                settings[name] = power_settings[name]
+                continue
+            val = self.power_changer.get_global(name)
+            if val is not None:
+                settings[name] = val
+        settings.update(overrides)
+        self.logger.debug(f'returning value ({settings})')
+        return settings, list(overrides)
+
+    def apply_playback(self, name_id):
+        """Send playback settings of the wallpaper without switching to it."""
+        self.logger.debug(
+            f'called method [apply_playback] with arguments (name_id={name_id})')
+        data = self.handler.get_data(name_id)
+        self.power_changer.save_globals(data.get('playback', {}))
+        playback, overridden = self.get_playback_settings(data)
+        if playback:
+            self.settings_changer.setup_many(playback)
+        self.handler.add_pos('playback_applied', overridden)
+
+    def set_playback(self, name_id, settings, *, clear=False):
+        self.logger.debug(
+            f'called method [set_playback] with arguments (name_id={name_id}, settings={settings}, clear={clear})')
+        for name, val in settings.items():
+            if name not in PLAYBACK_SETTINGS:
+                raise KeyError(
+                    f'Setting "{name}" can\'t be set per wallpaper, choose from: {PLAYBACK_SETTINGS}')
+            if not self.settings_changer.name_type_check[name](val):
+                error_msg = f'Invalid value ({val}) for setting "{name}"'
+                self.logger.error(
+                    f'Hangled exception: "{error_msg}", program finished')
+                raise ValueError(error_msg)
+        playback = {} if clear else self.handler.get_data(
+            name_id).get('playback', {})
+        playback.update(settings)
+        self.handler.add_subpos(name_id, 'playback', playback)
+        return playback
+
+    def derive_playback(self, data):
+        """Suggest overrides for heavy wallpapers by their type and size."""
+        playback = dict(PLAYBACK_BY_TYPE.get(
+            data.get('type', '').lower(), {}))
+        if data.get('disksize', 0) >= HEAVY_WALLPAPER_SIZE:
+            playback.update(HEAVY_WALLPAPER_PLAYBACK)
+        return playback
+
+    def derive_all_playback(self):
+        """Store suggested overrides for wallpapers which have none."""
+        self.logger.debug('called method [derive_all_playback]')
+        changed = {}
+        for id, data in self.handler.get_ids().items():
+            if data.get('playback'):
+                continue
+            playback = self.derive_playback(data)
+            if playback:
+                data['playback'] = playback
+                changed[id] = data
+        if changed:
+            self.handler.add_many(changed)
+        return changed
+
+    def get_media_path(self, name_id):
+        self.logger.debug(
+            f'called method [get_media_path] with arguments (name_id={name_id})')
+        wp_data = self.handler.get_data(name_id)
+        return self.full_path / Path(name_id) / Path(wp_data['file'])
+
+    def _get_prefetch_limit(self, max_bytes=None):
+        if max_bytes is not None:
+            return int(max_bytes)
+        try:
+            return int(self.handler.get_data('prefetch_max_bytes'))
+        except KeyError:
+            return PREFETCH_MAX_BYTES
+
+    def prefetch(self, name_id, *, max_bytes=None, wait=False):
+        """Warm the page cache with the media file of the wallpaper.
+
+        With wait=True the file is read before returning instead of
+        leaving the readahead to the kernel.
+        Returns the number of bytes requested from the kernel.
+        """
+        self.logger.debug(
+            f'called method [prefetch] with arguments (name_id={name_id}, max_bytes={max_bytes}, wait={wait})')
+        media_path = self.get_media_path(name_id)
+        if not media_path.is_file():
+            self.logger.info(
+                f'nothing to prefetch for id:{name_id}, "{media_path}" is not a file')
+            return 0
+        length = min(media_path.stat().st_size,
+                     self._get_prefetch_limit(max_bytes))
+        with open(media_path, 'rb') as file:
+            if hasattr(os, 'posix_fadvise'):
+                # The kernel reads the pages in the background,
+                # so this returns before the file is actually cached
+                os.posix_fadvise(file.fileno(), 0, length,
+                                 os.POSIX_FADV_WILLNEED)
+            if wait or not hasattr(os, 'posix_fadvise'):
+                self._read_range(file, length)
+        self.logger.info(
+            f'prefetched {length} bytes of "{media_path}"')
+        return length
+
+    def evict(self, name_id, *, max_bytes=None):
+        """Drop the media file of the wallpaper from the page cache.
+
+        Returns False if the platform can't do it.
+        """
+        self.logger.debug(
+            f'called method [evict] with arguments (name_id={name_id}, max_bytes={max_bytes})')
+        media_path = self.get_media_path(name_id)
+        if not hasattr(os, 'posix_fadvise') or not media_path.is_file():
+            return False
+        length = min(media_path.stat().st_size,
+                     self._get_prefetch_limit(max_bytes))
+        with open(media_path, 'rb') as file:
+            os.posix_fadvise(file.fileno(), 0, length,
+                             os.POSIX_FADV_DONTNEED)
+        return True
+
+    def _read_range(self, file, length):
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(PREFETCH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+    def time_media_read(self, name_id, *, max_bytes=None):
+        """Read the media file of the wallpaper and return elapsed seconds.
+
+        Returns None if the media file is missing.
+        """
+        self.logger.debug(
+            f'called method [time_media_read] with arguments (name_id={name_id}, max_bytes={max_bytes})')
+        media_path = self.get_media_path(name_id)
+        if not media_path.is_file():
+            self.logger.info(
+                f'nothing to read for id:{name_id}, "{media_path}" is not a file')
+            return None
+        start = time.perf_counter()
+        with open(media_path, 'rb') as file:
+            self._read_range(file, self._get_prefetch_limit(max_bytes))
+        elapsed = time.perf_counter() - start
+        self.logger.debug(f'returning value ({elapsed})')
+        return elapsed
+
     def _parse_into_str(self, data, name):
         out = data.get(name, 'Unspecified')
         if isinstance(out, list):
@@ -231,37 +484,289 @@ class WallpaperChanger():
         else:
             return str(out)
 
-    def setup_random(self, *, filters={}, fuzzy=True):
+    def _fits_limits(self, data, max_size, max_resolution):
+        # Items without measurements are kept, run "update-list" to measure them
+        if max_size is not None and data.get('disksize', 0) > max_size:
+            return False
+        if max_resolution is not None and 'resolution' in data:
+            return fits_resolution(data['resolution'], max_resolution)
+        return True
+
+    def setup_random(self, *, filters={}, fuzzy=True, max_size=None, max_resolution=None):
         self.logger.debug(
-            f'called method [setup_random] with arguments (filters={filters}, fuzzy={fuzzy})')
+            f'called method [setup_random] with arguments (filters={filters}, fuzzy={fuzzy}, max_size={max_size}, max_resolution={max_resolution})')
         wp_ids = self.handler.get_ids()
-        all_data = self.handler.get_data()
         new_ids = {}
         for id, data in wp_ids.items():
             # Check if value in data also contains in filters
-            if all([self._parse_into_str(data, name) in val for name, val in filters.items()]):
+            if all([self._parse_into_str(data, name).casefold() in [v.casefold() for v in val]
+                    for name, val in filters.items()]):
                 new_ids[id] = data
         if not filters:
             new_ids = wp_ids
+        new_ids = {id: data for id, data in new_ids.items()
+                   if self._fits_limits(data, max_size, max_resolution)}
         if not new_ids:
             error_msg = f"Could not find wallpapers with this filters: {filters}"
+            if max_size is not None or max_resolution is not None:
+                error_msg += f", max_size={max_size}, max_resolution={max_resolution}"
             self.logger.error(
                 f'Hangled exception: "{error_msg}", program finished')
             raise ValueError(error_msg)
 
+        try:
+            next_id = self.handler.get_data('next_id')
+        except KeyError:
+            next_id = None
+        last_id = self.handler.get_data('last_id')
+        if next_id in new_ids and next_id != last_id:
+            # This one was chosen and prefetched during the previous call
+            name_id = next_id
+        elif len(new_ids) > 1:
+            name_id = self._choose_random(new_ids, exclude=(last_id,))
+        else:
+            name_id = self._choose_random(new_ids)
+
+        if self.setup(name_id, silent_delete=True, fuzzy=fuzzy):
+            self.logger.info(
+                f'setup_random failed because got non-existent id, recursive calling itself again')
+            return self.setup_random(filters=filters, fuzzy=fuzzy,
+                                     max_size=max_size, max_resolution=max_resolution)
+        self._prefetch_next(new_ids, exclude=(name_id,))
+
+    def _choose_random(self, wp_ids, *, exclude=()):
         last_ids = self.handler.get_data('prev_ids')
+        ids = [id for id in wp_ids if id not in exclude]
         weights = []
-        for id in new_ids:
+        for id in ids:
             try:
-                freq = float(all_data[id]['freq'])
+                freq = float(wp_ids[id]['freq'])
             except KeyError:
                 freq = 1.0
             if id in last_ids:
                 weights.append(0.1*freq)
             else:
                 weights.append(freq)
+        return choices(ids, weights=weights)[0]
 
-        if self.setup(choices(list(new_ids.keys()), weights=weights), silent_delete=True, fuzzy=fuzzy):
-            self.logger.info(
-                f'setup_random failed because got non-existent id, recursive calling itself again')
-            self.setup_random(filters=filters, fuzzy=fuzzy)
+    def _prefetch_next(self, wp_ids, *, exclude=()):
+        self.logger.debug(
+            f'called method [_prefetch_next] with arguments (exclude={exclude})')
+        if len(wp_ids) <= len(exclude):
+            return
+        next_id = self._choose_random(wp_ids, exclude=exclude)
+        self.handler.add_pos('next_id', next_id)
+        try:
+            self.prefetch(next_id)
+        except OSError as e:
+            self.logger.warning(
+                f'could not prefetch id:{next_id}, reason: "{e}"')
+
+
+class PowerChanger():
+    def __init__(self, steampath, logging_handler=None, *, settings_changer=None) -> None:
+        if logging_handler is None:
+            formatter = logging.Formatter(
+                '%(asctime)s - [%(levelname)s] - [%(module)s] - "%(message)s"')
+            file_handler = log_handlers.TimedRotatingFileHandler(
+                LOG_PATH, when='D', interval=7, backupCount=3)
+            file_handler.setFormatter(formatter)
+            logging_handler = file_handler
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(logging_handler)
+
+        self.handler = ConfigHandler(
+            logging_handler=logging_handler)
+        if settings_changer is None:
+            settings_changer = SettingsChanger(
+                steampath, logging_handler=logging_handler)
+        self.settings_changer = settings_changer
+        try:
+            self.supply_path = Path(self.handler.get_data('power_supply_path'))
+        except KeyError:
+            self.supply_path = POWER_SUPPLY_PATH
+
+    def _read_attr(self, supply: Path, name):
+        try:
+            with open(supply / name, 'r') as file:
+                return file.read().strip()
+        except OSError:
+            return ''
+
+    def read_state(self):
+        self.logger.debug(
+            f'called method [read_state], supply_path={self.supply_path}')
+        has_battery = False
+        if self.supply_path.is_dir():
+            for supply in sorted(self.supply_path.iterdir()):
+                supply_type = self._read_attr(supply, 'type')
+                if supply_type in ('Mains', 'USB') and self._read_attr(supply, 'online') == '1':
+                    self.logger.debug('returning value (ac)')
+                    return 'ac'
+                if supply_type == 'Battery' and self._read_attr(supply, 'scope') != 'Device':
+                    has_battery = True
+        # Desktops without any power supply info are treated as plugged in
+        state = 'battery' if has_battery else 'ac'
+        self.logger.debug(f'returning value ({state})')
+        return state
+
+    def get_profiles(self):
+        profiles = {name: dict(vals) for name, vals in POWER_PROFILES.items()}
+        try:
+            for name, vals in self.handler.get_data('power_profiles').items():
+                profiles.setdefault(name, {}).update(vals)
+        except KeyError:
+            pass
+        return profiles
+
+    def set_profile(self, profile, name, val):
+        self.logger.debug(
+            f'called method [set_profile] with arguments (profile={profile}, name={name}, val={val})')
+        if name == 'type':
+            valid = all(wp_type in ('scene', 'video', 'web')
+                        for wp_type in val.lower().split(','))
+        elif name in PROFILE_SETTINGS:
+            try:
+                valid = self.settings_changer.name_type_check[name](val)
+            except ValueError:
+                valid = False
+        else:
+            raise KeyError(
+                f'Setting "{name}" can\'t be set in a power profile, choose from: {PROFILE_SETTINGS + ("type",)}')
+        if not valid:
+            error_msg = f'Invalid value ({val}) for setting "{name}"'
+            self.logger.error(
+                f'Hangled exception: "{error_msg}", program finished')
+            raise ValueError(error_msg)
+        try:
+            profiles = self.handler.get_data('power_profiles')
+        except KeyError:
+            profiles = {}
+        profiles.setdefault(profile, {})[name] = val
+        self.handler.add_pos('power_profiles', profiles)
+
+    def get_profile_settings(self, profile):
+        """Plasma settings of the profile, other managed settings get global values."""
+        profiles = self.get_profiles()
+        if profile not in profiles:
+            raise KeyError(f'Unknown power profile: "{profile}"')
+        managed = {name for vals in profiles.values() for name in vals
+                   if name in PROFILE_SETTINGS}
+        settings = {}
+        for name in managed:
+            if name in profiles[profile]:
+                settings[name] = profiles[profile][name]
+                continue
+            val = self.get_global(name)
+            if val is not None:
+                settings[name] = val
+        return settings
+
+    def get_owned_settings(self):
+        """Settings currently set by the power profile or the wallpaper, not by the user."""
+        owned = {name for name in self.get_active_settings()
+                 if name in PROFILE_SETTINGS}
+        try:
+            owned.update(self.handler.get_data('playback_applied'))
+        except KeyError:
+            pass
+        return owned
+
+    def save_globals(self, names):
+        """Remember the user's values of settings before a profile or a wallpaper changes them."""
+        self.logger.debug(
+            f'called method [save_globals] with arguments (names={names})')
+        owned = self.get_owned_settings()
+        names = [name for name in names if name not in owned]
+        if not names:
+            return
+        try:
+            saved = self.handler.get_data('power_globals')
+        except KeyError:
+            saved = {}
+        live = {}
+        for name, val in self.settings_changer.read():
+            live.setdefault(name, val)
+        for name in names:
+            if name in live:
+                saved[name] = live[name]
+        self.handler.add_pos('power_globals', saved)
+
+    def get_global(self, name):
+        """The user's value of the setting, None if it is unknown."""
+        try:
+            return self.handler.get_data('power_globals')[name]
+        except KeyError:
+            pass
+        try:
+            return self.handler.get_data(name)
+        except KeyError:
+            warning_msg = f'global value of "{name}" is unknown, call "pull" to save it'
+            self.logger.warning(warning_msg)
+            print(f'WARNING: {warning_msg}')
+            return None
+
+    def get_active_settings(self):
+        try:
+            return self.get_profiles()[self.handler.get_data('power_state')]
+        except KeyError:
+            return {}
+
+    def merge_playback(self, overrides, power_settings):
+        """Wallpaper overrides limited by the power profile."""
+        overrides = dict(overrides)
+        if 'Fps' in overrides and 'Fps' in power_settings:
+            # Don't let a wallpaper undo the power saving
+            overrides['Fps'] = str(
+                min(int(overrides['Fps']), int(power_settings['Fps'])))
+        return overrides
+
+    def get_current_playback(self):
+        try:
+            return self.handler.get_data(
+                self.handler.get_data('last_id')).get('playback', {})
+        except (KeyError, AttributeError):
+            return {}
+
+    def apply(self, *, profile=None, force=False):
+        """Apply the profile of the current power source if it has changed.
+
+        Returns the applied profile name or None if nothing was done.
+        """
+        self.logger.debug(
+            f'called method [apply] with arguments (profile={profile}, force={force})')
+        if profile is None:
+            profile = self.read_state()
+        try:
+            last_profile = self.handler.get_data('power_state')
+        except KeyError:
+            last_profile = None
+        if profile == last_profile and not force:
+            self.logger.debug(f'power profile "{profile}" is already applied')
+            return None
+        self.save_globals(PROFILE_SETTINGS)
+        settings = self.get_profile_settings(profile)
+        # Overrides of the current wallpaper stay until it is switched
+        settings.update(self.merge_playback(
+            self.get_current_playback(), self.get_profiles()[profile]))
+        self.settings_changer.setup_many(settings)
+        self.handler.add_pos('power_state', profile)
+        self.logger.info(f'power profile "{profile}" applied')
+        return profile
+
+    def watch(self, interval=30.0, callback=None):
+        self.logger.debug(
+            f'called method [watch] with arguments (interval={interval})')
+        while True:
+            try:
+                profile = self.apply()
+            except Exception as e:
+                # plasmashell may be not started yet or restarting,
+                # "power_state" is not saved, so the next check retries
+                self.logger.warning(
+                    f'could not apply power profile, reason: "{e}"')
+                profile = None
+            if profile is not None and callback is not None:
+                callback(profile)
+            time.sleep(interval)
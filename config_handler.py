@@ -96,6 +96,16 @@ class ConfigHandler:
             json.dump(all_data, conf)
             self.logger.debug('json dump')
 
+    def add_many(self, positions):
+        self.logger.debug(
+            f'called method [add_many] with arguments (positions=data with len={len(positions)})')
+        all_data = self.get_data()
+        all_data.update(positions)
+
+        with open(CONFIG_PATH, 'w') as conf:
+            json.dump(all_data, conf)
+            self.logger.debug('json dump')
+
     def add_subpos(self, id, subpos, data):
         self.logger.debug(
             f'called method [add_subpos] with arguments (id={id}, subpos={subpos}, data={data})')
@@ -127,12 +137,18 @@ class ConfigHandler:
     def send_cmd(self, id, val):
         self.logger.debug(
             f'called method [send_cmd] with arguments (id={id}, val={val})')
+        self.send_cmds({id: val})
+
+    def send_cmds(self, settings):
+        self.logger.debug(
+            f'called method [send_cmds] with arguments (settings={settings})')
         script = """
         for (d of desktops()) {
             d.wallpaperPlugin = "com.github.casout.wallpaperEngineKde";
             d.currentConfigGroup = Array("Wallpaper", "com.github.casout.wallpaperEngineKde", "General");
         """
-        script += f'd.writeConfig("{id}", "{val}");'
+        for id, val in settings.items():
+            script += f'd.writeConfig("{id}", "{val}");\n'
         script += '\n}'
         bus = dbus.SessionBus()
         plasma = dbus.Interface(bus.get_object(
@@ -1,4 +1,31 @@
+import os
 from pathlib import Path
 
 LOG_PATH = Path('~/.config/WPE-cli/log').expanduser()
 CONFIG_PATH = Path('~/.config/WPE-cli/config.json').expanduser()
+
+# Upper bound of media bytes warmed into the page cache ahead of a switch
+PREFETCH_MAX_BYTES = 512 * 1024**2
+PREFETCH_CHUNK_SIZE = 4 * 1024**2
+
+# Threads used by "update-list" to measure wallpaper folders
+INDEX_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+POWER_SUPPLY_PATH = Path('/sys/class/power_supply')
+# Plasma settings and "random" filters applied for each power source,
+# settings missing in a profile are reverted to the values saved by "pull"
+POWER_PROFILES = {
+    'ac': {},
+    'battery': {'Fps': '15', 'type': 'scene,video'},
+}
+
+# Settings that can be overridden for a single wallpaper
+PLAYBACK_SETTINGS = ('Fps', 'Volume', 'MuteAudio')
+# Rendering settings that a power profile may change
+PROFILE_SETTINGS = ('DisplayMode', 'Fps', 'MuteAudio', 'Volume')
+# Overrides suggested by "wallpaper playback --auto"
+PLAYBACK_BY_TYPE = {
+    'web': {'Fps': '30'},
+}
+HEAVY_WALLPAPER_SIZE = 1024**3
+HEAVY_WALLPAPER_PLAYBACK = {'Fps': '30'}
@@ -0,0 +1,140 @@
+import os
+import re
+import struct
+from pathlib import Path
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+_MP4_CONTAINERS = (b'moov', b'trak', b'mdia', b'edts')
+
+
+def parse_size(text):
+    """Convert strings like "1024", "500M" or "1.5GB" into bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*',
+                         str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f'Invalid size: "{text}"')
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def parse_resolution(text):
+    """Convert strings like "1920x1080", "1080p" or "4k" into (width, height)."""
+    text = str(text).strip().lower()
+    match = re.fullmatch(r'(\d+)\s*[x*]\s*(\d+)', text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    match = re.fullmatch(r'(\d+)p', text)
+    if match:
+        height = int(match.group(1))
+        return height * 16 // 9, height
+    match = re.fullmatch(r'(\d+)k', text)
+    if match:
+        width = int(match.group(1)) * 960
+        return width, width * 9 // 16
+    raise ValueError(f'Invalid resolution: "{text}"')
+
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}' if unit != 'B' else f'{size} {unit}'
+        size /= 1024
+    return f'{size:.1f} TiB'
+
+
+def fits_resolution(resolution, max_resolution):
+    """Compare both sides regardless of orientation."""
+    return max(resolution) <= max(max_resolution) and \
+        min(resolution) <= min(max_resolution)
+
+
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def folder_fingerprint(path, *names):
+    """Cheap change marker built from stats of the folder and its key files.
+
+    Workshop updates rewrite the folder and the project file, so there is
+    no need to stat every file to notice them.
+    """
+    parts = []
+    for item in (Path(path), *(Path(path) / name for name in names if name)):
+        try:
+            stat = item.stat()
+        except OSError:
+            parts.append(f'{item.name}:missing')
+            continue
+        parts.append(f'{item.name}:{stat.st_mtime_ns}:{stat.st_size}')
+    return '|'.join(parts)
+
+
+def media_resolution(path):
+    """Read (width, height) from the file header, None if it is unknown."""
+    try:
+        with open(path, 'rb') as file:
+            head = file.read(32)
+            if head.startswith(b'\x89PNG\r\n\x1a\n'):
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head.startswith(b'\xff\xd8'):
+                return _jpeg_resolution(file)
+            if head[4:8] == b'ftyp':
+                return _mp4_resolution(file, 0, os.fstat(file.fileno()).st_size)
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+def _jpeg_resolution(file):
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length = struct.unpack('>H', file.read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>xHH', file.read(5))
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def _mp4_resolution(file, start, end):
+    """Walk ISO media boxes down to the track headers, skipping media data."""
+    best = None
+    offset = start
+    while offset + 8 <= end:
+        file.seek(offset)
+        size, box_type = struct.unpack('>I4s', file.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', file.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return best
+        if box_type in _MP4_CONTAINERS:
+            found = _mp4_resolution(file, offset + header, offset + size)
+        elif box_type == b'tkhd':
+            # width and height are 16.16 fixed point numbers at the end of the box
+            file.seek(offset + size - 8)
+            width, height = struct.unpack('>II', file.read(8))
+            found = (width >> 16, height >> 16)
+        else:
+            found = None
+        if found and all(found) and (best is None or found[0]*found[1] > best[0]*best[1]):
+            best = found
+        offset += size
+    return best
@@ -1,13 +1,15 @@
 import argparse
 import logging
 import sys
+import time
 from logging import handlers as log_handlers
 from pathlib import Path
 
-from changers import SettingsChanger, WallpaperChanger
+from changers import PowerChanger, SettingsChanger, WallpaperChanger
 from config_handler import ConfigHandler
 from constants import LOG_PATH
 from exception_handler import handle_exception
+from media_info import format_size, parse_resolution, parse_size
 
 sys.excepthook = handle_exception
 
@@ -47,6 +49,8 @@ class Plugin:
         setup_wallpaper_parser.add_argument('name_or_id', help='Name or ID')
         setup_wallpaper_parser.add_argument('--apply-accent-color', help='Apply accent color from wallpaper config in your KDE plasma',
                                             action=argparse.BooleanOptionalAction, default=False)
+        setup_wallpaper_parser.add_argument('--timing', help='Print how long the plasma update and reading the media file took',
+                                            action=argparse.BooleanOptionalAction, default=False)
         random_wallpaper_parser = wallpaper_subparsers.add_parser('random')
         random_wallpaper_parser.add_argument(
             '--type', help='Type of wallpapers to choose from. Syntax: "--type scene,video,web"', choices=['scene', 'video', 'web'])
@@ -58,6 +62,32 @@ class Plugin:
             '--nsfw', help='Add wallpapers with rating "Mature" into the mix', action=argparse.BooleanOptionalAction, default=False)
         random_wallpaper_parser.add_argument('--apply-accent-color', help='Apply accent color from wallpaper config in your KDE plasma',
                                              action=argparse.BooleanOptionalAction, default=False)
+        random_wallpaper_parser.add_argument(
+            '--max-size', help='Skip wallpapers bigger than this on disk. Syntax: "--max-size 500M"', type=parse_size, default=None)
+        random_wallpaper_parser.add_argument(
+            '--max-resolution', help='Skip wallpapers with higher media resolution. Syntax: "--max-resolution 1920x1080" or "1080p"', type=parse_resolution, default=None)
+        random_wallpaper_parser.add_argument('--timing', help='Print how long the plasma update and reading the media file took',
+                                             action=argparse.BooleanOptionalAction, default=False)
+        prefetch_wallpaper_parser = wallpaper_subparsers.add_parser(
+            'prefetch', help='load media of the wallpaper into the page cache, by default the one "random" will pick next')
+        prefetch_wallpaper_parser.add_argument(
+            'name_or_id', help='Name or ID', nargs='?', default=None)
+        prefetch_wallpaper_parser.add_argument(
+            '--max-bytes', help='Limit of bytes to prefetch (setting "prefetch_max_bytes" by default)', type=int, default=None)
+        prefetch_wallpaper_parser.add_argument('--timing', help='Compare cold and warm read time of the media file',
+                                               action=argparse.BooleanOptionalAction, default=False)
+        playback_wallpaper_parser = wallpaper_subparsers.add_parser(
+            'playback', help='view or change playback settings (Fps, Volume, MuteAudio) used only with this wallpaper')
+        playback_wallpaper_parser.add_argument(
+            'settings', help='Settings to override. Syntax: "Fps=30 MuteAudio=true"', nargs='*')
+        playback_wallpaper_parser.add_argument(
+            '--wallpaper', help='Name or ID of the wallpaper (the current one by default)', default=None)
+        playback_wallpaper_parser.add_argument(
+            '--clear', help='Remove overrides, so global settings are used', action=argparse.BooleanOptionalAction, default=False)
+        playback_wallpaper_parser.add_argument(
+            '--auto', help='Derive overrides from type and size of the wallpaper', action=argparse.BooleanOptionalAction, default=False)
+        playback_wallpaper_parser.add_argument(
+            '--all', help='With "--auto": derive overrides for all wallpapers without them', action=argparse.BooleanOptionalAction, default=False)
         wallpaper_subparsers.add_parser(
             'name', help='get name of the current wallpaper')
         wallpaper_subparsers.add_parser(
@@ -86,6 +116,42 @@ class Plugin:
         get_settings_parser = settings_subparsers.add_parser('get')
         get_settings_parser.add_argument('name', help='setting name')
 
+        library_parser = subparsers.add_parser(
+            'library', help='Information about installed wallpapers')
+        library_parser.set_defaults(func=self.library)
+        library_subparsers = library_parser.add_subparsers(
+            dest='library_command')
+        stats_library_parser = library_subparsers.add_parser(
+            'stats', help='show disk usage by type and the largest wallpapers')
+        stats_library_parser.add_argument(
+            '--top', help='How many of the largest wallpapers to show', type=int, default=10)
+
+        power_parser = subparsers.add_parser(
+            'power', help='Switch playback settings by power source (AC or battery)')
+        power_parser.set_defaults(func=self.power)
+        power_parser.add_argument(
+            '--power-supply-path', help='Directory with power supply info (setting "power_supply_path", "/sys/class/power_supply" by default)', default=None)
+        power_subparsers = power_parser.add_subparsers(dest='power_command')
+        power_subparsers.add_parser(
+            'status', help='print the current power source and its profile')
+        apply_power_parser = power_subparsers.add_parser(
+            'apply', help='apply the profile of the current power source if it has changed')
+        apply_power_parser.add_argument(
+            '--profile', help='Apply this profile instead of the detected one', default=None)
+        apply_power_parser.add_argument(
+            '--force', help='Apply the profile even if it is already applied', action=argparse.BooleanOptionalAction, default=False)
+        watch_power_parser = power_subparsers.add_parser(
+            'watch', help='keep applying profiles when the power source changes')
+        watch_power_parser.add_argument(
+            '--interval', help='Seconds between checks', type=float, default=30.0)
+        profile_power_parser = power_subparsers.add_parser(
+            'profile', help='change a setting of a power profile')
+        profile_power_parser.add_argument(
+            'profile', help='Profile name, for example: "ac", "battery"')
+        profile_power_parser.add_argument(
+            'name', help='Setting name or "type" to filter "random" wallpapers')
+        profile_power_parser.add_argument('value')
+
         update_parser = subparsers.add_parser(
             'update-list', help='receive the list of available wallpapers from workshop folder for this CLI')
         update_parser.set_defaults(func=self.update_list)
@@ -125,8 +191,11 @@ class Plugin:
 
         self.settings_changer = SettingsChanger(
             self.steamdir, logging_handler=logging_handler)
+        self.power_changer = PowerChanger(
+            self.steamdir, logging_handler=logging_handler, settings_changer=self.settings_changer)
         self.wp_changer = WallpaperChanger(
-            self.steamdir, logging_handler=logging_handler)
+            self.steamdir, logging_handler=logging_handler,
+            settings_changer=self.settings_changer, power_changer=self.power_changer)
 
         # run method from argparse
         dict_args = vars(args).copy()
@@ -140,7 +209,18 @@ class Plugin:
     def pull(self, **kwargs):
         self.logger.info(f'called method [pull] with arguments: ({kwargs})')
         settings_list = self.settings_changer.read()
+        # Values set by a power profile or a wallpaper are not the user's defaults
+        owned = self.power_changer.get_owned_settings()
+        skipped = set()
         for setting_tuple in settings_list:
+            if setting_tuple[0] in owned:
+                if setting_tuple[0] in skipped:
+                    continue
+                skipped.add(setting_tuple[0])
+                output = f'skip "{setting_tuple[0]}", it is set by the power profile or the wallpaper'
+                self.logger.info(output)
+                print(output)
+                continue
             self.logger.debug(f'adding setting {setting_tuple} to config')
             self.handler.add_pos(*setting_tuple)
 
@@ -157,6 +237,9 @@ class Plugin:
             filters = {}
             if kwargs['type']:
                 filters['type'] = kwargs['type'].split()
+            elif 'type' in self.power_changer.get_active_settings():
+                filters['type'] = self.power_changer.get_active_settings()[
+                    'type'].split(',')
             if kwargs['contentrating']:
                 filters['contentrating'] = kwargs['contentrating'].split()
             elif kwargs['nsfw']:
@@ -171,7 +254,84 @@ class Plugin:
 
             self.logger.debug(
                 f'wallpaper random with filters: "{filters}"')
-            self.wp_changer.setup_random(filters=filters)
+            self.wp_changer.setup_random(
+                filters=filters, max_size=kwargs['max_size'], max_resolution=kwargs['max_resolution'])
+
+        elif kwargs['wallpaper_command'] == 'prefetch':
+            self.logger.debug(
+                f'wallpaper prefetch "{kwargs["name_or_id"]}"')
+            if kwargs['name_or_id'] is None:
+                try:
+                    wp_id = self.handler.get_data('next_id')
+                except KeyError:
+                    print('ERROR: nothing to prefetch, call "wallpaper random" first')
+                    sys.exit(1)
+            else:
+                wp_id = self.wp_changer.find_id(kwargs['name_or_id'])
+            if not kwargs['timing']:
+                size = self.wp_changer.prefetch(
+                    wp_id, max_bytes=kwargs['max_bytes'])
+                output = f'<{wp_id}> prefetched {size} bytes'
+            elif not self.wp_changer.get_media_path(wp_id).is_file():
+                output = f'<{wp_id}> media file is missing, nothing to prefetch'
+            else:
+                evicted = self.wp_changer.evict(
+                    wp_id, max_bytes=kwargs['max_bytes'])
+                cold_time = self.wp_changer.time_media_read(
+                    wp_id, max_bytes=kwargs['max_bytes'])
+                self.wp_changer.evict(wp_id, max_bytes=kwargs['max_bytes'])
+                start_time = time.perf_counter()
+                size = self.wp_changer.prefetch(
+                    wp_id, max_bytes=kwargs['max_bytes'], wait=True)
+                prefetch_time = time.perf_counter() - start_time
+                warm_time = self.wp_changer.time_media_read(
+                    wp_id, max_bytes=kwargs['max_bytes'])
+                output = f'<{wp_id}> prefetched {size} bytes in {prefetch_time*1000:.1f} ms'
+                output += f', cold read: {cold_time*1000:.1f} ms, warm read: {warm_time*1000:.1f} ms'
+                if not evicted:
+                    output += ' (could not evict the file from the page cache, cold read may be warm)'
+            self.logger.info(f'program output = "{output}"')
+            print(output)
+
+        elif kwargs['wallpaper_command'] == 'playback':
+            self.logger.debug(
+                f'wallpaper playback "{kwargs["settings"]}" for "{kwargs["wallpaper"]}"')
+            if kwargs['all'] and not kwargs['auto']:
+                print('ERROR: "--all" works only together with "--auto"')
+                sys.exit(1)
+            if kwargs['auto'] and kwargs['all']:
+                changed = self.wp_changer.derive_all_playback()
+                for id, data in changed.items():
+                    output = f'<{id}> "{data["title"]}" {data["playback"]}'
+                    self.logger.info(f'program output = "{output}"')
+                    print(output)
+                return
+            current_id = self.handler.get_data('last_id')
+            if kwargs['wallpaper'] is None:
+                wp_id = current_id
+            else:
+                wp_id = self.wp_changer.find_id(kwargs['wallpaper'])
+            settings = {}
+            for pair in kwargs['settings']:
+                try:
+                    name, val = pair.split('=', 1)
+                except ValueError:
+                    print(f'ERROR: bad setting "{pair}", use syntax "name=value"')
+                    sys.exit(1)
+                settings[name] = val
+            if kwargs['auto']:
+                settings = {**self.wp_changer.derive_playback(
+                    self.handler.get_data(wp_id)), **settings}
+            if settings or kwargs['clear']:
+                playback = self.wp_changer.set_playback(
+                    wp_id, settings, clear=kwargs['clear'])
+                if wp_id == current_id:
+                    self.wp_changer.apply_playback(wp_id)
+            else:
+                playback = self.handler.get_data(wp_id).get('playback', {})
+            output = f'<{wp_id}> {playback}'
+            self.logger.info(f'program output = "{output}"')
+            print(output)
 
         elif kwargs['wallpaper_command'] == 'name':
             self.logger.debug(f'wallpaper name')
@@ -233,6 +393,20 @@ class Plugin:
             self.logger.info(output)
             print(output)
 
+        if kwargs.get('timing', False) and kwargs['wallpaper_command'] in ('setup', 'random'):
+            elapsed = self.wp_changer.last_update_time
+            wp_id = self.handler.get_data('last_id')
+            # Plasma loads the media after the update, reading it here shows
+            # whether it comes from the page cache or from the disk
+            read_time = self.wp_changer.time_media_read(wp_id)
+            output = f'<{wp_id}> plasma update: {elapsed*1000:.1f} ms'
+            if read_time is None:
+                output += ', media file is missing'
+            else:
+                output += f', media read: {read_time*1000:.1f} ms'
+            self.logger.info(f'program output = "{output}"')
+            print(output)
+
         if kwargs.get('apply_accent_color', False):
             id, _ = self.wp_changer.get_last_id_name()
             wp_data = self.handler.get_data(id)
@@ -264,11 +438,69 @@ class Plugin:
             val = self.handler.get_data(name)
             self.settings_changer.setup(name, val)
 
+    def power(self, **kwargs):
+        self.logger.info(
+            f'called method [power] with arguments: ({kwargs})')
+        if kwargs['power_supply_path'] is not None:
+            self.power_changer.supply_path = Path(kwargs['power_supply_path'])
+
+        if kwargs['power_command'] == 'status':
+            try:
+                profile = self.handler.get_data('power_state')
+            except KeyError:
+                profile = 'none'
+            output = f'power source: {self.power_changer.read_state()}, applied profile: {profile}'
+            self.logger.info(f'program output = "{output}"')
+            print(output)
+
+        elif kwargs['power_command'] == 'apply':
+            profile = self.power_changer.apply(
+                profile=kwargs['profile'], force=kwargs['force'])
+            if profile is not None:
+                output = f'applied power profile "{profile}"'
+                self.logger.info(f'program output = "{output}"')
+                print(output)
+
+        elif kwargs['power_command'] == 'watch':
+            def notify(profile):
+                output = f'applied power profile "{profile}"'
+                self.logger.info(f'program output = "{output}"')
+                print(output, flush=True)
+            try:
+                self.power_changer.watch(kwargs['interval'], callback=notify)
+            except KeyboardInterrupt:
+                self.logger.info('power watch stopped by user')
+
+        elif kwargs['power_command'] == 'profile':
+            self.power_changer.set_profile(
+                kwargs['profile'], kwargs['name'], kwargs['value'])
+
     def update_list(self, **kwargs):
         self.logger.info(
             f'called method [update_list] with arguments: ({kwargs})')
         self.wp_changer.get_all_data()
 
+    def library(self, **kwargs):
+        self.logger.info(
+            f'called method [library] with arguments: ({kwargs})')
+        if kwargs['library_command'] == 'stats':
+            totals, largest = self.wp_changer.get_library_stats(kwargs['top'])
+            output = []
+            for wp_type, (count, size) in sorted(totals.items()):
+                output.append(f'{wp_type}: {count} wallpapers, {format_size(size)}')
+            count = sum(count for count, _ in totals.values())
+            size = sum(size for _, size in totals.values())
+            output.append(f'total: {count} wallpapers, {format_size(size)}')
+            output.append('')
+            output.append('largest:')
+            for id, data in largest:
+                resolution = 'x'.join(map(str, data.get('resolution', ['?'])))
+                output.append(
+                    f'<{id}> "{data["title"]}" [{data.get("type", "Unspecified")}, {resolution}] {format_size(data.get("disksize", 0))}')
+            output = '\n'.join(output)
+            self.logger.info(f'program output = "{output}"')
+            print(output)
+
     def settings(self, **kwargs):
         self.logger.info(
             f'called method [settings] with arguments: ({kwargs})')